@@ -2,7 +2,14 @@ import os
 import librosa
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import butter, lfilter
+from scipy.signal import sosfilt
+
+try:
+    from src.plan import get_protection_plan
+except ModuleNotFoundError as e:  # Run as a script: python src/decode.py
+    if e.name != 'src':
+        raise
+    from plan import get_protection_plan
 
 def decode_watermark(audio_path):
     print(f"Analyzing {os.path.basename(audio_path)} for Quantum Signature...")
@@ -10,21 +17,14 @@ def decode_watermark(audio_path):
     
     # 1. Bandpass Filter (Isolate the 18kHz Shield)
     # We want to hear ONLY the noise layer, not the voice.
-    nyq = 0.5 * sr
-    low_cut = 17500
-    high_cut = 22000
+    plan = get_protection_plan(sr)
     
-    if sr < 40000:
+    if plan.sos_band is None:
         print("ERROR: Sample rate too low to contain ultrasonic watermark.")
         return
 
-    # Normalize cutoffs
-    low = low_cut / nyq
-    high = high_cut / nyq
-    
     # Apply Filter
-    b, a = butter(5, [low, high], btype='band', analog=False)
-    y_shield = lfilter(b, a, y)
+    y_shield = sosfilt(plan.sos_band, y)
     
     # 2. Envelope Follower (Convert high freq vibration to a volume curve)
     # Take absolute value
@@ -32,8 +32,7 @@ def decode_watermark(audio_path):
     
     # Smooth the envelope (Low pass filter the volume curve at 50Hz)
     # This turns the jagged waveform into a smooth line showing "ON/OFF" states
-    b_smooth, a_smooth = butter(3, 50/nyq, btype='low') 
-    envelope_smoothed = lfilter(b_smooth, a_smooth, envelope)
+    envelope_smoothed = sosfilt(plan.sos_envelope, envelope)
     
     # 3. Thresholding (Convert to Binary ON/OFF)
     # If volume > threshold, it's a "1" (Signal). Else "0" (Gap).
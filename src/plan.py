@@ -0,0 +1,127 @@
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.signal import butter, get_window
+
+# How many distinct (sample rate, parameter) plans to keep around
+PLAN_CACHE_SIZE = 16
+KEY_CACHE_SIZE = 8
+
+@dataclass(frozen=True, eq=False)
+class ProtectionPlan:
+    """Filters, Morse layout and STFT window for one (sample rate, parameters) set, reused across files."""
+    sr: int
+    sos_high: Optional[np.ndarray]      # Layer 1 high-pass (None if sr is too low)
+    sos_low: np.ndarray                 # Layer 2 low-pass
+    morse_period: int                   # Length of one Morse 'Q' repeat in samples
+    morse_gaps: Tuple[Tuple[int, int], ...]  # (start, end) OFF segments inside one period
+    n_fft: int
+    hop_length: int
+    window: np.ndarray                  # STFT/ISTFT analysis window
+    sos_band: Optional[np.ndarray]      # Decoder 17.5kHz - 22kHz band-pass
+    sos_envelope: Optional[np.ndarray]  # Decoder 50Hz envelope smoother
+
+    def apply_morse_gating(self, signal):
+        """Zeroes the Morse gaps in place, period by period, without building a full-length mask"""
+        n = len(signal)
+        for offset in range(0, n, self.morse_period):
+            for start, end in self.morse_gaps:
+                if offset + start >= n:
+                    break
+                signal[offset + start:offset + end] = 0
+        return signal
+
+def _normalize(cutoff, fs):
+    # Keeps every edge strictly below Nyquist (scalar or [low, high] band)
+    normal_cutoff = np.asarray(cutoff, dtype=float) / (0.5 * fs)
+    return np.minimum(normal_cutoff, 0.999)
+
+def _design_sos(cutoff, fs, btype, order):
+    return butter(order, _normalize(cutoff, fs), btype=btype, analog=False, output='sos')
+
+def _morse_layout(sr):
+    """Morse Code 'Q' (--.-) as OFF segments of a single period"""
+    # Timing: 100ms dot, 300ms dash
+    dot_len = int(sr * 0.1)
+    dash_len = int(sr * 0.3)
+    gap_len = int(sr * 0.1)
+
+    # The Pattern: Dash, Gap, Dash, Gap, Dot, Gap, Dash, Gap (Space)
+    segments = [
+        (dash_len, True), (gap_len, False),  # Dash
+        (dash_len, True), (gap_len, False),  # Dash
+        (dot_len, True),  (gap_len, False),  # Dot
+        (dash_len, True), (gap_len, False),  # Dash
+        (dash_len, False),                   # Pause between repeats
+    ]
+
+    gaps = []
+    pos = 0
+    for length, on in segments:
+        if not on:
+            # Merge the trailing gap with the pause
+            if gaps and gaps[-1][1] == pos:
+                gaps[-1] = (gaps[-1][0], pos + length)
+            else:
+                gaps.append((pos, pos + length))
+        pos += length
+    return pos, tuple(gaps)
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def get_protection_plan(sr, cutoff_high=18000, cutoff_low=4000, order=5,
+                        n_fft=2048, hop_length=512):
+    """Returns the cached plan for this sample rate and parameter set"""
+    sos_high = None
+    if sr > (cutoff_high * 2):
+        sos_high = _design_sos(cutoff_high, sr, 'high', order)
+    sos_low = _design_sos(cutoff_low, sr, 'low', order)
+
+    morse_period, morse_gaps = _morse_layout(sr)
+
+    # Same window librosa uses by default for stft/istft
+    window = get_window('hann', n_fft, fftbins=True)
+
+    sos_band = None
+    sos_envelope = None
+    if sr >= 40000:
+        # Upper band edge is clamped below Nyquist for 40kHz - 44kHz material
+        sos_band = _design_sos([17500, 22000], sr, 'band', 5)
+        sos_envelope = _design_sos(50, sr, 'low', 3)
+
+    return ProtectionPlan(
+        sr=sr,
+        sos_high=sos_high,
+        sos_low=sos_low,
+        morse_period=morse_period,
+        morse_gaps=morse_gaps,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        window=window,
+        sos_band=sos_band,
+        sos_envelope=sos_envelope,
+    )
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _load_key_bits(path, mtime_ns, size):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    bits = np.array([int(b) for b in data["seed_bits"]], dtype=np.int8)
+    bits.setflags(write=False)
+    return bits
+
+def get_key_bits(key_path):
+    """Raw 0/1 key bits, re-read only when the key file changes"""
+    path = os.path.abspath(key_path)
+    st = os.stat(path)
+    return _load_key_bits(path, st.st_mtime_ns, st.st_size)
+
+def tile_key(bits, size):
+    """Repeats the key to cover exactly `size` entries"""
+    if len(bits) < size:
+        repeats = int(np.ceil(size / len(bits)))
+        bits = np.tile(bits, repeats)
+    return bits[:size]
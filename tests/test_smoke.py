@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.audio import apply_amplitude_protection, apply_phase_shifts
+from src.decode import decode_watermark
+from src.plan import get_protection_plan
+
+@pytest.fixture
+def key_path(tmp_path):
+    bits = np.random.RandomState(0).randint(0, 2, 4096)
+    path = tmp_path / "quantum_key.json"
+    path.write_text(json.dumps({"seed_bits": "".join(map(str, bits))}))
+    return str(path)
+
+@pytest.mark.parametrize("sr", [44100, 48000])
+def test_protect_and_decode(sr, key_path, tmp_path, capsys):
+    y = (0.1 * np.sin(2 * np.pi * 440 * np.arange(3 * sr) / sr)).astype(np.float32)
+
+    y_amp = apply_amplitude_protection(y, sr, key_path)
+    y_final = apply_phase_shifts(y_amp, sr, key_path)
+    assert len(y_amp) == len(y)
+    assert np.all(np.isfinite(y_final))
+
+    out = tmp_path / "protected.wav"
+    sf.write(str(out), np.clip(y_final[:len(y)], -1.0, 1.0), sr)
+    decode_watermark(str(out))
+    assert "VERIFIED" in capsys.readouterr().out
+
+@pytest.mark.parametrize("sr", [16000, 40000, 42000, 44100])
+def test_plan_builds_at_edge_sample_rates(sr):
+    plan = get_protection_plan(sr)
+    assert (plan.sos_band is None) == (sr < 40000)
+
+def test_morse_gating_matches_tiled_pattern():
+    sr = 44100
+    dot, dash, gap = int(sr * 0.1), int(sr * 0.3), int(sr * 0.1)
+    pattern = np.concatenate([
+        np.ones(dash), np.zeros(gap), np.ones(dash), np.zeros(gap),
+        np.ones(dot), np.zeros(gap), np.ones(dash), np.zeros(gap),
+        np.zeros(dash),
+    ])
+    n = 3 * len(pattern) + 1234
+    expected = np.tile(pattern, 4)[:n]
+
+    gated = get_protection_plan(sr).apply_morse_gating(np.ones(n))
+    assert np.array_equal(gated, expected)